@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import os
+import uuid
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
 st.set_page_config(page_title="Survey Demographic Dashboard", layout="wide")
 
+# Strings restored from the Parquet sidecar come back Arrow-backed as well.
+pd.options.mode.string_storage = "pyarrow"
+
 SURVEY_FILES = (
     Path(__file__).parent / "Survey.csv",
     Path(__file__).parent / "Survey.xlsx",
@@ -47,34 +53,108 @@ FILTER_COLUMNS: Iterable[str] = (
     "Church Affiliation",
 )
 
+SINGLE_VALUE_FIELDS: Iterable[str] = (
+    "Age Range",
+    "Sex",
+    "Ethnicity",
+    "Educational Background",
+    "Career/Occupation/Industry",
+    "Attendance Frequency",
+    "Attendance Mode",
+    "Daily Media Time",
+    "Media Impact on Faith",
+    "Personal Devotion Regularity",
+)
+
 MULTI_VALUE_FIELDS: Iterable[str] = (
     "Media Platforms",
     "Church Contribution",
 )
 
+# Bump whenever load_data changes the cleaned column types, so stale sidecars are ignored.
+SURVEY_CACHE_VERSION = 6
+
+# Hashable, order-independent form of the sidebar selections, used as a cache key.
+SelectionKey = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+# Arrow-backed strings keep the .str kernels in C++ instead of per-object Python.
+ARROW_STRING_DTYPE = pd.StringDtype("pyarrow")
+
+# Line breaks and non-breaking spaces both collapse to a plain space.
+WHITESPACE_TRANSLATION: Dict[int, int] = {ord("\n"): ord(" "), ord("\xa0"): ord(" ")}
+
 
 def clean_string_series(series: pd.Series) -> pd.Series:
     """Normalize white space and remove empty responses."""
-    if series.dtype != object:
+    if series.dtype == object:
+        series = series.astype(ARROW_STRING_DTYPE)
+    elif not pd.api.types.is_string_dtype(series.dtype):
         return series
-    cleaned = (
-        series.astype(str)
-        .str.replace("\n", " ", regex=False)
-        .str.replace("\xa0", " ", regex=False)
-        .str.strip()
-    )
-    cleaned = cleaned.replace({"nan": pd.NA, "": pd.NA})
-    return cleaned
+    cleaned = series.str.translate(WHITESPACE_TRANSLATION).str.strip()
+    return cleaned.mask(cleaned.isin(("nan", "")), pd.NA)
+
+
+def strip_options(parts: object) -> Optional[Tuple[str, ...]]:
+    """Trim the options of one split multi-select answer, dropping blanks.
+
+    Tuples rather than lists keep the frame hashable for ``st.cache_data``.
+    """
+    if not isinstance(parts, list):
+        return None
+    options = tuple(part.strip() for part in parts if part.strip())
+    return options or None
+
+
+def read_survey_excel(path: Path) -> pd.DataFrame:
+    """Read the workbook with calamine, falling back to openpyxl."""
+    try:
+        return pd.read_excel(path, engine="calamine")
+    except (ImportError, ValueError):
+        # python-calamine is not installed, or pandas predates the engine.
+        # pandas already opens openpyxl workbooks read-only with cached values.
+        return pd.read_excel(path, engine="openpyxl")
+
+
+def survey_cache_path(path: Path) -> Path:
+    """Location of the cleaned Parquet sidecar for a survey source file."""
+    return path.with_suffix(f"{path.suffix}.v{SURVEY_CACHE_VERSION}.parquet")
+
+
+def read_survey_cache(cache_path: Path) -> Optional[pd.DataFrame]:
+    """Load the cleaned sidecar, or ``None`` if it cannot be read."""
+    try:
+        df = pd.read_parquet(cache_path)
+    except (OSError, ValueError):
+        # A truncated or corrupt sidecar is a cache miss; load_data rewrites it.
+        return None
+    # Parquet drops the string dtype of category labels; restore it.
+    for column in df.select_dtypes("category").columns:
+        categories = df[column].cat.categories.astype(ARROW_STRING_DTYPE)
+        df[column] = df[column].cat.set_categories(categories)
+    # Parquet hands list columns back as numpy arrays; restore the tuples.
+    for column in MULTI_VALUE_FIELDS:
+        if column in df.columns:
+            df[column] = df[column].map(tuple, na_action="ignore")
+    return df
+
+
+def write_survey_cache(df: pd.DataFrame, cache_path: Path) -> None:
+    """Write the sidecar via a temporary file so readers never see a partial one."""
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only deployment still works, it just re-parses on cold start.
+        pass
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 @st.cache_data(show_spinner=False)
 def load_data() -> pd.DataFrame:
     for path in SURVEY_FILES:
         if path.exists():
-            if path.suffix.lower() == ".csv":
-                df = pd.read_csv(path)
-            else:
-                df = pd.read_excel(path)
             break
     else:
         st.error(
@@ -83,78 +163,157 @@ def load_data() -> pd.DataFrame:
         )
         st.stop()
 
+    cache_path = survey_cache_path(path)
+    if cache_path.exists() and cache_path.stat().st_mtime >= path.stat().st_mtime:
+        df = read_survey_cache(cache_path)
+        if df is not None:
+            return df
+
+    if path.suffix.lower() == ".csv":
+        df = pd.read_csv(path)
+    else:
+        df = read_survey_excel(path)
+
     df = df.rename(columns=RENAME_MAP)
     df.columns = [col.strip() for col in df.columns]
 
-    for column in df.columns:
-        df[column] = clean_string_series(df[column])
-
     drop_cols = [col for col in SENSITIVE_COLUMNS if col in df.columns]
     if drop_cols:
         df = df.drop(columns=drop_cols)
 
+    text_cols = df.select_dtypes(include=["object", "string"]).columns
+    df[text_cols] = df[text_cols].astype(ARROW_STRING_DTYPE).apply(clean_string_series)
+
+    category_cols = [
+        col for col in dict.fromkeys((*FILTER_COLUMNS, *SINGLE_VALUE_FIELDS)) if col in df.columns
+    ]
+    df[category_cols] = df[category_cols].astype("category")
+
+    for column in MULTI_VALUE_FIELDS:
+        if column in df.columns:
+            df[column] = df[column].str.split(";").map(strip_options)
+
+    write_survey_cache(df, cache_path)
     return df
 
 
-def apply_filters(
-    data: pd.DataFrame,
-    selections: Dict[str, List[str]],
-    options_map: Dict[str, List[str]],
-) -> pd.DataFrame:
-    filtered = data.copy()
-    for column, selected in selections.items():
-        if not selected:
-            continue
-        available = options_map.get(column, [])
-        if set(selected) == set(available):
+@st.cache_data(show_spinner=False)
+def filter_options(data: pd.DataFrame) -> Dict[str, List[str]]:
+    """Sorted answer choices for each sidebar filter present in the data."""
+    return {
+        column: sorted(data[column].dropna().unique().tolist())
+        for column in FILTER_COLUMNS
+        if column in data.columns
+    }
+
+
+def apply_filters(data: pd.DataFrame, selections: Dict[str, List[str]]) -> pd.DataFrame:
+    """Filter on every non-empty selection; an empty selection means all answers."""
+    selection_key = tuple(
+        sorted(
+            (column, tuple(sorted(selected)))
+            for column, selected in selections.items()
+            if selected
+        )
+    )
+    if not selection_key:
+        return data
+    return filter_rows(data, selection_key)
+
+
+@st.cache_data(show_spinner=False)
+def filter_rows(data: pd.DataFrame, selection_key: SelectionKey) -> pd.DataFrame:
+    """Keep the rows matching every ``(column, allowed values)`` pair at once.
+
+    Filter columns are categorical, so matching compares the integer codes.
+    """
+    masks = []
+    for column, selected in selection_key:
+        values = data[column].cat
+        wanted = values.categories.get_indexer(selected)
+        masks.append(np.isin(values.codes.to_numpy(), wanted[wanted >= 0]))
+    mask = np.logical_and.reduce(masks)
+    return data.iloc[mask]
+
+
+@st.cache_data(show_spinner=False)
+def csv_bytes(data: pd.DataFrame) -> bytes:
+    """Encode the filtered responses for download once per distinct frame."""
+    joined = {
+        column: data[column].str.join(";")
+        for column in MULTI_VALUE_FIELDS
+        if column in data.columns
+    }
+    return data.assign(**joined).to_csv(index=False).encode("utf-8")
+
+
+def count_responses(
+    answers: Dict[str, pd.Series],
+    columns: Iterable[str],
+) -> Dict[str, pd.Series]:
+    """Count answers once per single-select column, shared by metrics and charts."""
+    counts: Dict[str, pd.Series] = {}
+    for column in columns:
+        if column not in answers:
             continue
-        filtered = filtered[filtered[column].isin(selected)]
-    return filtered
+        counts[column] = category_counts(answers[column])
+    return counts
 
 
-def single_select_chart(data: pd.Series, title: str) -> None:
-    counts = (
-        data.dropna()
-        .replace("", pd.NA)
-        .dropna()
-        .value_counts()
-        .reset_index()
-    )
+def category_counts(series: pd.Series) -> pd.Series:
+    """Count a categorical column by histogramming its integer codes.
+
+    Categories with no remaining answers are left out, most common first.
+    """
+    codes = series.cat.codes.to_numpy()
+    categories = series.cat.categories
+    counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(categories)), index=categories)
+    return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+
+@st.cache_data(show_spinner=False)
+def explode_multivalue(series: pd.Series) -> pd.Series:
+    """Flatten the pre-split option lists into one entry per selected option.
+
+    A single ``np.concatenate`` avoids the repeated index ``explode`` builds.
+    """
+    answers = series.dropna().to_numpy()
+    if not len(answers):
+        return pd.Series(dtype=ARROW_STRING_DTYPE)
+    return pd.Series(np.concatenate(answers), dtype=ARROW_STRING_DTYPE)
+
+
+def single_select_chart(counts: pd.Series, title: str) -> None:
     if counts.empty:
         st.info(f"No data available for {title.lower()}.")
         return
 
+    counts = counts.reset_index()
     counts.columns = ["Category", "Responses"]
     chart = (
-        alt.Chart(counts)
+        alt.Chart(alt.Data(values=counts.to_dict("records")))
         .mark_bar(radius=4)
         .encode(
             y=alt.Y("Category:N", sort="-x", title=""),
             x=alt.X("Responses:Q", title="Respondents"),
-            tooltip=["Category", "Responses"],
+            tooltip=["Category:N", "Responses:Q"],
         )
         .properties(title=title)
     )
     st.altair_chart(chart, use_container_width=True)
 
 
-def single_select_pie_chart(data: pd.Series, title: str) -> None:
-    counts = (
-        data.dropna()
-        .replace("", pd.NA)
-        .dropna()
-        .value_counts()
-        .reset_index()
-    )
+def single_select_pie_chart(counts: pd.Series, title: str) -> None:
     if counts.empty:
         st.info(f"No data available for {title.lower()}.")
         return
 
+    counts = counts.reset_index()
     counts.columns = ["Category", "Responses"]
     counts["Percent"] = counts["Responses"] / counts["Responses"].sum()
 
     chart = (
-        alt.Chart(counts)
+        alt.Chart(alt.Data(values=counts.to_dict("records")))
         .mark_arc(innerRadius=40)
         .encode(
             theta=alt.Theta("Responses:Q", stack=True),
@@ -171,15 +330,7 @@ def single_select_pie_chart(data: pd.Series, title: str) -> None:
     st.altair_chart(chart, use_container_width=True)
 
 
-def multivalue_chart(data: pd.Series, title: str) -> None:
-    exploded = (
-        data.dropna()
-        .str.split(";")
-        .explode()
-        .str.strip()
-        .replace("", pd.NA)
-        .dropna()
-    )
+def multivalue_chart(exploded: pd.Series, title: str) -> None:
     if exploded.empty:
         st.info(f"No multi-select responses available for {title.lower()}.")
         return
@@ -187,42 +338,28 @@ def multivalue_chart(data: pd.Series, title: str) -> None:
     counts = exploded.value_counts().reset_index()
     counts.columns = ["Category", "Responses"]
     chart = (
-        alt.Chart(counts)
+        alt.Chart(alt.Data(values=counts.to_dict("records")))
         .mark_bar(radius=4)
         .encode(
             y=alt.Y("Category:N", sort="-x", title=""),
             x=alt.X("Responses:Q", title="Respondents"),
-            tooltip=["Category", "Responses"],
+            tooltip=["Category:N", "Responses:Q"],
         )
         .properties(title=title)
     )
     st.altair_chart(chart, use_container_width=True)
 
 
-def summarize_category(series: pd.Series) -> str:
-    counts = (
-        series.dropna()
-        .replace("", pd.NA)
-        .dropna()
-        .value_counts()
-    )
-    if counts.empty:
+def summarize_category(counts: Optional[pd.Series]) -> str:
+    if counts is None or counts.empty:
         return "N/A"
     top_label = counts.index[0]
     top_count = counts.iloc[0]
     return f"{top_label} ({top_count})"
 
 
-def summarize_multivalue(series: pd.Series) -> str:
-    exploded = (
-        series.dropna()
-        .str.split(";")
-        .explode()
-        .str.strip()
-        .replace("", pd.NA)
-        .dropna()
-    )
-    if exploded.empty:
+def summarize_multivalue(exploded: Optional[pd.Series]) -> str:
+    if exploded is None or exploded.empty:
         return "N/A"
     counts = exploded.value_counts()
     top_label = counts.index[0]
@@ -230,109 +367,140 @@ def summarize_multivalue(series: pd.Series) -> str:
     return f"{top_label} ({top_count})"
 
 
-def main() -> None:
-    st.title("Survey Demographic Dashboard")
-    st.caption("Interactive overview of respondent demographics and engagement patterns.")
-
-    data = load_data()
-
-    with st.sidebar:
-        st.header("Filter Responses")
-        selections: Dict[str, List[str]] = {}
-        options_map: Dict[str, List[str]] = {}
-        for column in FILTER_COLUMNS:
-            if column not in data.columns:
-                continue
-            options = sorted(data[column].dropna().unique())
-            options_map[column] = options
-            selections[column] = st.multiselect(
-                column,
-                options=options,
-                default=options,
-            )
-
-        st.markdown("---")
-        st.write("Download filtered responses")
-        filtered_snapshot = apply_filters(data, selections, options_map)
-        st.download_button(
-            "Download CSV",
-            data=filtered_snapshot.to_csv(index=False).encode("utf-8"),
-            file_name="filtered_survey_responses.csv",
-            mime="text/csv",
-            use_container_width=True,
-        )
+@st.fragment
+def render_download(filtered: pd.DataFrame) -> None:
+    st.download_button(
+        "Download CSV",
+        data=csv_bytes(filtered),
+        file_name="filtered_survey_responses.csv",
+        mime="text/csv",
+        use_container_width=True,
+    )
 
-    filtered = apply_filters(data, selections, options_map)
 
+def render_metrics(
+    response_count: int,
+    counts: Dict[str, pd.Series],
+    exploded: Dict[str, pd.Series],
+) -> None:
     col_a, col_b, col_c = st.columns(3)
-    col_a.metric("Responses", f"{len(filtered):,}")
-    col_b.metric("Top Age Range", summarize_category(filtered.get("Age Range", pd.Series(dtype=object))))
+    col_a.metric("Responses", f"{response_count:,}")
+    col_b.metric("Top Age Range", summarize_category(counts.get("Age Range")))
     col_c.metric(
         "Most Common Media Platform",
-        summarize_multivalue(filtered.get("Media Platforms", pd.Series(dtype=object))),
+        summarize_multivalue(exploded.get("Media Platforms")),
     )
 
     col_d, col_e, col_f = st.columns(3)
     col_d.metric(
         "Attendance Frequency",
-        summarize_category(filtered.get("Attendance Frequency", pd.Series(dtype=object))),
+        summarize_category(counts.get("Attendance Frequency")),
     )
     col_e.metric(
         "Attendance Mode",
-        summarize_category(filtered.get("Attendance Mode", pd.Series(dtype=object))),
+        summarize_category(counts.get("Attendance Mode")),
     )
     col_f.metric(
         "Personal Devotion",
-        summarize_category(filtered.get("Personal Devotion Regularity", pd.Series(dtype=object))),
+        summarize_category(counts.get("Personal Devotion Regularity")),
     )
 
+
+def render_demographics(counts: Dict[str, pd.Series]) -> None:
     st.subheader("Demographic Overview")
     demo_cols = st.columns(3)
-    if "Age Range" in filtered.columns:
+    if "Age Range" in counts:
         with demo_cols[0]:
-            single_select_chart(filtered["Age Range"], "Respondents by Age Range")
-    if "Sex" in filtered.columns:
+            single_select_chart(counts["Age Range"], "Respondents by Age Range")
+    if "Sex" in counts:
         with demo_cols[1]:
-            single_select_pie_chart(filtered["Sex"], "Respondents by Sex")
-    if "Ethnicity" in filtered.columns:
+            single_select_pie_chart(counts["Sex"], "Respondents by Sex")
+    if "Ethnicity" in counts:
         with demo_cols[2]:
-            single_select_chart(filtered["Ethnicity"], "Respondents by Ethnicity")
+            single_select_chart(counts["Ethnicity"], "Respondents by Ethnicity")
 
     edu_cols = st.columns(2)
-    if "Educational Background" in filtered.columns:
+    if "Educational Background" in counts:
         with edu_cols[0]:
-            single_select_chart(filtered["Educational Background"], "Educational Background")
-    if "Career/Occupation/Industry" in filtered.columns:
+            single_select_chart(counts["Educational Background"], "Educational Background")
+    if "Career/Occupation/Industry" in counts:
         with edu_cols[1]:
-            single_select_chart(filtered["Career/Occupation/Industry"], "Career / Industry")
+            single_select_chart(counts["Career/Occupation/Industry"], "Career / Industry")
 
+
+def render_engagement(counts: Dict[str, pd.Series]) -> None:
     engage_cols = st.columns(2)
-    if "Attendance Frequency" in filtered.columns:
+    if "Attendance Frequency" in counts:
         with engage_cols[0]:
             single_select_pie_chart(
-                filtered["Attendance Frequency"],
+                counts["Attendance Frequency"],
                 "Church Attendance Frequency",
             )
-    if "Attendance Mode" in filtered.columns:
+    if "Attendance Mode" in counts:
         with engage_cols[1]:
-            single_select_pie_chart(filtered["Attendance Mode"], "Attendance Mode")
+            single_select_pie_chart(counts["Attendance Mode"], "Attendance Mode")
+
 
+def render_media(counts: Dict[str, pd.Series]) -> None:
     media_cols = st.columns(2)
-    if "Daily Media Time" in filtered.columns:
+    if "Daily Media Time" in counts:
         with media_cols[0]:
-            single_select_chart(filtered["Daily Media Time"], "Daily Media Consumption")
-    if "Media Impact on Faith" in filtered.columns:
+            single_select_chart(counts["Daily Media Time"], "Daily Media Consumption")
+    if "Media Impact on Faith" in counts:
         with media_cols[1]:
-            single_select_chart(filtered["Media Impact on Faith"], "Perceived Media Impact on Faith")
+            single_select_chart(counts["Media Impact on Faith"], "Perceived Media Impact on Faith")
+
 
+def render_multivalue(exploded: Dict[str, pd.Series]) -> None:
     st.subheader("Multi-Select Engagement Insights")
     multi_cols = st.columns(2)
-    if "Media Platforms" in filtered.columns:
+    if "Media Platforms" in exploded:
         with multi_cols[0]:
-            multivalue_chart(filtered["Media Platforms"], "Media Platforms Used")
-    if "Church Contribution" in filtered.columns:
+            multivalue_chart(exploded["Media Platforms"], "Media Platforms Used")
+    if "Church Contribution" in exploded:
         with multi_cols[1]:
-            multivalue_chart(filtered["Church Contribution"], "Church Contribution Methods")
+            multivalue_chart(exploded["Church Contribution"], "Church Contribution Methods")
+
+
+def main() -> None:
+    st.title("Survey Demographic Dashboard")
+    st.caption("Interactive overview of respondent demographics and engagement patterns.")
+
+    data = load_data()
+
+    with st.sidebar:
+        st.header("Filter Responses")
+        selections: Dict[str, List[str]] = {}
+        for column, options in filter_options(data).items():
+            selections[column] = st.multiselect(
+                column,
+                options=options,
+                default=[],
+                placeholder="All",
+            )
+
+        st.markdown("---")
+        st.write("Download filtered responses")
+        render_download(apply_filters(data, selections))
+
+    filtered = apply_filters(data, selections)
+    answers = {
+        column: filtered[column]
+        for column in (*SINGLE_VALUE_FIELDS, *MULTI_VALUE_FIELDS)
+        if column in filtered.columns
+    }
+    counts = count_responses(answers, SINGLE_VALUE_FIELDS)
+    exploded = {
+        column: explode_multivalue(answers[column])
+        for column in MULTI_VALUE_FIELDS
+        if column in answers
+    }
+
+    render_metrics(len(filtered), counts, exploded)
+    render_demographics(counts)
+    render_engagement(counts)
+    render_media(counts)
+    render_multivalue(exploded)
 
     with st.expander("View Filtered Responses"):
         st.dataframe(filtered, use_container_width=True)